@@ -0,0 +1,55 @@
+from functools import lru_cache
+import re
+
+BLOOM_LEVELS = [
+    "Remembering",
+    "Understanding",
+    "Applying",
+    "Analyzing",
+    "Evaluating",
+    "Creating"
+]
+
+BLOOM_KEYWORDS = {
+    "Remembering": ["define", "list", "name", "state", "identify", "recall", "what is", "mention"],
+    "Understanding": ["explain", "summarize", "describe", "differentiate", "classify", "interpret", "outline"],
+    "Applying": ["apply", "solve", "use", "demonstrate", "calculate", "implement", "show how"],
+    "Analyzing": ["analyze", "compare", "contrast", "examine", "categorize", "investigate", "why"],
+    "Evaluating": ["evaluate", "justify", "critique", "assess", "argue", "recommend", "validate"],
+    "Creating": ["design", "create", "develop", "construct", "propose", "formulate", "build"],
+}
+
+# Keyword -> level, so one regex sweep scores every level at once
+_KEYWORD_LEVEL = {
+    keyword: level
+    for level, keywords in BLOOM_KEYWORDS.items()
+    for keyword in keywords
+}
+
+# Compiled once per process; longest keywords first so multi-word keywords win over their prefixes
+_BLOOM_RE = re.compile(
+    r"\b(?:"
+    + "|".join(map(re.escape, sorted(_KEYWORD_LEVEL, key=len, reverse=True)))
+    + r")\b"
+)
+
+@lru_cache(maxsize=512)
+def detect_bloom_level(question_text: str) -> str:
+    text = (question_text or "").strip().lower()
+    if not text:
+        return "Not detected"
+
+    # Each distinct keyword scores 1, or 3 when it opens the question
+    scores = dict.fromkeys(BLOOM_KEYWORDS, 0)
+    seen = set()
+    for match in _BLOOM_RE.finditer(text):
+        keyword = match.group()
+        level = _KEYWORD_LEVEL[keyword]
+        if keyword not in seen:
+            seen.add(keyword)
+            scores[level] += 1
+        if match.start() == 0:
+            scores[level] += 2
+
+    best_level = max(scores, key=scores.get)
+    return best_level if scores[best_level] > 0 else "Understanding"
@@ -1,62 +1,268 @@
 import requests
+from requests.adapters import HTTPAdapter
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import hashlib
 import json
+import numpy as np
+import orjson
+import random
+import threading
 import time
 
+# Process-wide LRU of prompt -> response, shared by every GeminiLLM instance
+CACHE_SIZE = 512
+_response_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Connection pool size; keep >= the largest run_batch worker count
+POOL_MAXSIZE = 20
+
+# Embedding input is truncated to this many characters; enough to identify a request
+EMBED_MAX_CHARS = 8000
+
+# Transient statuses worth retrying; anything else fails on the first response
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+def _cacheable(text: str, finish_reason) -> bool:
+    # Only a complete reply is worth replaying; an empty, SAFETY- or MAX_TOKENS-cut
+    # reply must be regenerated on the next call instead
+    return finish_reason == "STOP" and bool(text.strip())
+
+def _strip_cr(text: str) -> str:
+    # Normalize line endings once at the source; skip the copy when there is nothing to strip
+    return text.replace("\r", "") if "\r" in text else text
+
 class GeminiLLM:
-    def __init__(self, api_key):
+    def __init__(self, api_key, backoff: float = 2.0, rate_limit_backoff: float = 5.0):
         self.api_key = api_key
+        self.backoff = backoff
+        self.rate_limit_backoff = rate_limit_backoff
         self.url = (
             "https://generativelanguage.googleapis.com/v1/models/"
             "gemini-2.5-flash:generateContent"
         )
+        self.stream_url = (
+            "https://generativelanguage.googleapis.com/v1/models/"
+            "gemini-2.5-flash:streamGenerateContent"
+        )
+        self.embed_url = (
+            "https://generativelanguage.googleapis.com/v1beta/models/"
+            "gemini-embedding-001:embedContent"
+        )
+
+        # Reuse one keep-alive connection pool instead of a new TLS handshake per call
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=POOL_MAXSIZE))
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        # Request body template, one per thread so concurrent calls never share the leaf
+        self._local = threading.local()
+
+    def close(self):
+        self.session.close()
+
+    def _payload(self, prompt: str) -> dict:
+        if not hasattr(self._local, "payload"):
+            self._local.leaf = {"text": ""}
+            self._local.payload = {"contents": [{"parts": [self._local.leaf]}]}
+        self._local.leaf["text"] = prompt
+        return self._local.payload
+
+    def _cache_key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.url}\n{prompt}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key: str):
+        with _cache_lock:
+            if key in _response_cache:
+                _response_cache.move_to_end(key)
+                return _response_cache[key]
+        return None
+
+    def _cache_put(self, key: str, text: str):
+        with _cache_lock:
+            _response_cache[key] = text
+            _response_cache.move_to_end(key)
+            while len(_response_cache) > CACHE_SIZE:
+                _response_cache.popitem(last=False)
+
+    def run(self, prompt: str, retries: int = 3, use_cache: bool = True) -> str:
+        key = self._cache_key(prompt)
+        if use_cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                return cached
+
+        text, finish_reason = self._request(prompt, retries)
+        if _cacheable(text, finish_reason):
+            self._cache_put(key, text)
+        return text
+
+    def stream(self, prompt: str, use_cache: bool = True):
+        """Yield the response text in chunks as Gemini generates it."""
+        key = self._cache_key(prompt)
+        if use_cache:
+            cached = self._cache_get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        try:
+            response = self.session.post(
+                self.stream_url,
+                params={"key": self.api_key, "alt": "sse"},
+                json=self._payload(prompt),
+                timeout=60,
+                stream=True
+            )
+        except requests.exceptions.RequestException:
+            # Let the non-streaming path handle retries and error messages
+            yield self.run(prompt, use_cache=False)
+            return
+
+        with response:
+            if response.status_code in RETRYABLE_STATUSES:
+                # Back off as _request would (honoring Retry-After on a 429) before the
+                # non-streaming path retries, rather than hitting the limit again at once
+                if response.status_code == 429:
+                    delay = self._retry_delay(response, self.rate_limit_backoff)
+                else:
+                    delay = self._retry_delay(response, self.backoff)
+                response.close()
+                time.sleep(delay)
+                yield self.run(prompt, use_cache=False)
+                return
+            if response.status_code in [400, 403]:
+                raise RuntimeError(
+                    f"Gemini API error {response.status_code}: Invalid request or API key issue"
+                )
+            if response.status_code != 200:
+                raise RuntimeError(
+                    f"Gemini API error {response.status_code}: {self._error_body(response)}"
+                )
+
+            pieces = []
+            finish_reason = None
+            try:
+                # Server-sent events: one "data: {json}" line per chunk
+                for line in response.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = orjson.loads(line[5:])
+                    candidate = data["candidates"][0]
+                    finish_reason = candidate.get("finishReason", finish_reason)
+                    parts = candidate.get("content", {}).get("parts", [])
+                    text = _strip_cr("".join(part.get("text", "") for part in parts))
+                    if text:
+                        pieces.append(text)
+                        yield text
+            except requests.exceptions.RequestException as e:
+                raise RuntimeError(f"Network error: {str(e)}")
+            except (KeyError, IndexError, json.JSONDecodeError) as e:
+                raise RuntimeError(f"Failed to parse API response: {str(e)}")
+
+        text = "".join(pieces)
+        if _cacheable(text, finish_reason):
+            self._cache_put(key, text)
+
+    def embed(self, text: str) -> list:
+        """Return the embedding vector of text."""
+        response = self.session.post(
+            self.embed_url,
+            params={"key": self.api_key},
+            json={"content": {"parts": [{"text": text[:EMBED_MAX_CHARS]}]}},
+            timeout=30
+        )
+        if response.status_code != 200:
+            raise RuntimeError(
+                f"Gemini API error {response.status_code}: {self._error_body(response)}"
+            )
+        return orjson.loads(response.content)["embedding"]["values"]
+
+    def run_batch(self, prompts, max_workers: int = 8, retries: int = 3) -> list:
+        # Threads share the pooled session; results come back in prompt order
+        prompts = list(prompts)
+        max_workers = max(1, min(max_workers, POOL_MAXSIZE, len(prompts)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda p: self.run(p, retries), prompts))
+
+    async def run_async(self, prompt: str, retries: int = 3) -> str:
+        # Blocking I/O runs in the default executor, sharing the session pool and cache
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.run, prompt, retries))
+
+    async def run_many(self, prompts, retries: int = 3, concurrency: int = 8) -> list:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(prompt):
+            async with semaphore:
+                return await self.run_async(prompt, retries)
+
+        return await asyncio.gather(*(bounded(p) for p in prompts))
+
+    @staticmethod
+    def _retry_delay(response, default: float) -> float:
+        # Honor a numeric Retry-After header; HTTP-date values fall back to the default
+        try:
+            delay = max(0.0, float(response.headers.get("Retry-After", default)))
+        except (TypeError, ValueError):
+            delay = default
+        return delay + random.uniform(0, 0.5)
+
+    @staticmethod
+    def _error_body(response, limit: int = 512) -> str:
+        # Decode only a short prefix; error bodies can be large
+        return response.content[:limit].decode("utf-8", errors="replace")
+
+    def _request(self, prompt: str, retries: int) -> tuple:
+        payload = self._payload(prompt)
 
-    def run(self, prompt: str, retries: int = 3) -> str:
-        payload = {
-            "contents": [
-                {
-                    "parts": [
-                        {"text": prompt}
-                    ]
-                }
-            ]
-        }
-        
         for attempt in range(retries):
             try:
-                response = requests.post(
-                    f"{self.url}?key={self.api_key}",
-                    headers={"Content-Type": "application/json"},
-                    data=json.dumps(payload),
+                response = self.session.post(
+                    self.url,
+                    params={"key": self.api_key},
+                    json=payload,
                     timeout=60
                 )
 
                 if response.status_code == 200:
-                    data = response.json()
-                    return data["candidates"][0]["content"]["parts"][0]["text"]
-                
-                elif response.status_code == 429:
-                    # Rate limit or quota exceeded
-                    if attempt < retries - 1:
-                        time.sleep(5 * (attempt + 1))
-                        continue
-                    else:
-                        raise RuntimeError("API quota exhausted or rate limit reached. Please try again later.")
+                    candidate = orjson.loads(response.content)["candidates"][0]
+                    return (
+                        _strip_cr(candidate["content"]["parts"][0]["text"]),
+                        candidate.get("finishReason")
+                    )
                 
                 elif response.status_code in [400, 403]:
                     # Bad request or authentication error - don't retry
                     raise RuntimeError(
                         f"Gemini API error {response.status_code}: Invalid request or API key issue"
                     )
-                
-                else:
-                    # Other errors - retry with backoff
-                    if attempt < retries - 1:
-                        time.sleep(2 * (attempt + 1))
-                        continue
+
+                elif response.status_code not in RETRYABLE_STATUSES:
+                    raise RuntimeError(
+                        f"Gemini API error {response.status_code}: {self._error_body(response)}"
+                    )
+
+                elif attempt < retries - 1:
+                    # Transient error - retry with backoff (server-directed for 429)
+                    if response.status_code == 429:
+                        delay = self._retry_delay(response, self.rate_limit_backoff * (attempt + 1))
                     else:
-                        raise RuntimeError(
-                            f"Gemini API error {response.status_code}: {response.text}"
-                        )
+                        delay = self.backoff * (attempt + 1) + random.uniform(0, 0.5)
+                    time.sleep(delay)
+                    continue
+
+                elif response.status_code == 429:
+                    # Rate limit or quota exceeded
+                    raise RuntimeError("API quota exhausted or rate limit reached. Please try again later.")
+
+                else:
+                    raise RuntimeError(
+                        f"Gemini API error {response.status_code}: {self._error_body(response)}"
+                    )
 
             except requests.exceptions.ReadTimeout:
                 if attempt < retries - 1:
@@ -66,14 +272,14 @@ class GeminiLLM:
             
             except requests.exceptions.ConnectionError:
                 if attempt < retries - 1:
-                    time.sleep(2)
+                    time.sleep(self.backoff)
                     continue
                 else:
                     raise RuntimeError("Connection error. Please check your internet connection.")
             
             except requests.exceptions.RequestException as e:
                 if attempt < retries - 1:
-                    time.sleep(2)
+                    time.sleep(self.backoff)
                     continue
                 else:
                     raise RuntimeError(f"Network error: {str(e)}")
@@ -84,3 +290,61 @@ class GeminiLLM:
         
         # Fallback if we somehow exit the loop without returning
         raise RuntimeError("Failed to generate content after multiple attempts. Please try again.")
+
+class SemanticCache:
+    """Reuse a response when a new request is a near-duplicate of an earlier one.
+
+    Entries only match within the same scope (the part of a request that must be
+    identical, e.g. the question structure); the free-text query is compared by
+    embedding cosine similarity. The default threshold is strict because the cache
+    is shared across sessions and short related topics (e.g. "Operating Systems"
+    and "Distributed Systems") embed close together; only rewordings of the same
+    topic should match.
+    """
+
+    def __init__(self, llm: GeminiLLM, threshold: float = 0.98, max_entries: int = 256):
+        self.llm = llm
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # (scope hash, unit vector, response), oldest first
+        self._entries = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _scope_key(scope: str) -> str:
+        return hashlib.sha256(scope.encode("utf-8")).hexdigest()
+
+    def lookup(self, scope: str, query: str):
+        """Return (cached response or None, query vector to pass to store())."""
+        try:
+            vector = np.asarray(self.llm.embed(query), dtype=np.float32)
+        except (RuntimeError, requests.exceptions.RequestException, KeyError, json.JSONDecodeError):
+            # The cache is only an optimization; a failed embedding is a miss
+            return None, None
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None, None
+        vector /= norm
+
+        key = self._scope_key(scope)
+        with self._lock:
+            candidates = [(v, text) for k, v, text in self._entries if k == key]
+        if candidates:
+            similarities = np.stack([v for v, _ in candidates]) @ vector
+            best = int(similarities.argmax())
+            if similarities[best] >= self.threshold:
+                return candidates[best][1], vector
+        return None, vector
+
+    def discard(self, scope: str):
+        """Forget every response stored under scope."""
+        key = self._scope_key(scope)
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry[0] != key]
+
+    def store(self, scope: str, vector, response: str):
+        if vector is None:
+            return
+        with self._lock:
+            self._entries.append((self._scope_key(scope), vector, response))
+            del self._entries[:-self.max_entries]
@@ -2,7 +2,60 @@ from fpdf import FPDF
 from io import BytesIO
 import re
 
+# Line classifiers; the matching group name selects the handler
+_HEADING_RE = re.compile(r"(?P<h2>## )|(?P<h3>### )")
+_DASH_RE = re.compile(r"(?P<sep>[=\-]{3,}$)|(?P<bullet>- )")
+_STAR_RE = re.compile(r"(?P<bullet>\* )")
+_RULE_RE = re.compile(r"(?P<sep>[=\-]{3,}$)")
+_NUM_RE = re.compile(r"(?P<num>\d+[\.)])")
+_LABEL_RE = re.compile(
+    r"(?P<section>(?:INSTRUCTIONS|QUESTIONS|ANSWER KEY|MARK DISTRIBUTION|BLOOM'?S?\s+TAXONOMY\s+DISTRIBUTION|QUESTION\s+PAPER|SECTION\s+\d+)\s*:?$)"
+    r"|(?P<qa>(?:Question\s*\d+|Answer\s*\d+)\b)",
+    re.IGNORECASE,
+)
+
+# Dispatch on the first character so ordinary text never reaches a regex
+_FIRST_CHAR = {"#": _HEADING_RE, "-": _DASH_RE, "*": _STAR_RE, "=": _RULE_RE}
+_FIRST_CHAR.update(dict.fromkeys("0123456789", _NUM_RE))
+_FIRST_CHAR.update(dict.fromkeys("IQAMBSiqambs", _LABEL_RE))
+
+# Common Unicode characters mapped to ASCII equivalents
+_UNICODE_REPLACEMENTS = str.maketrans({
+    '\u2022': '-',  # bullet point
+    '\u2013': '-',  # en dash
+    '\u2014': '--', # em dash
+    '\u2018': "'",  # left single quote
+    '\u2019': "'",  # right single quote
+    '\u201c': '"',  # left double quote
+    '\u201d': '"',  # right double quote
+    '\u2026': '...', # ellipsis
+    '\u00b0': ' degrees', # degree symbol
+    '\u00d7': 'x',  # multiplication sign
+    '\u00f7': '/',  # division sign
+    '\u2192': '->',  # right arrow
+    '\u2190': '<-',  # left arrow
+    '\u2264': '<=',  # less than or equal
+    '\u2265': '>=',  # greater than or equal
+    '\u2260': '!=',  # not equal
+})
+
+def _latin1_safe(text: str) -> str:
+    """Drop characters the core PDF fonts cannot encode."""
+    # str.isascii() is O(1) in CPython, so plain ASCII skips the encode/decode copies
+    if text.isascii():
+        return text
+    return text.encode("latin-1", "ignore").decode("latin-1")
+
 class PDF(FPDF):
+    def __init__(self, title: str = ""):
+        # Page layout lives here so every document starts pre-configured; the core
+        # font metrics are already shared module-wide by fpdf, so nothing else to cache
+        super().__init__()
+        self.set_auto_page_break(auto=True, margin=20)
+        self.set_left_margin(15)
+        self.set_right_margin(15)
+        self.title = _latin1_safe(title)
+
     def header(self):
         self.set_font("Helvetica", "B", 18)
         self.set_text_color(0, 51, 102)
@@ -17,135 +70,132 @@ class PDF(FPDF):
         self.set_text_color(128, 128, 128)
         self.cell(0, 10, f"Page {self.page_no()}", align="C")
 
+    # Active body style, so repeated set_font/set_text_color calls can be skipped
+    _body_font = None
+    _body_color = None
+
+    def use(self, style="", size=11, color=(0, 0, 0)):
+        if self._body_font != (style, size):
+            self.set_font("Helvetica", style, size)
+            self._body_font = (style, size)
+        if self._body_color != color:
+            self.set_text_color(*color)
+            self._body_color = color
+
+# ================== LINE HANDLERS ==================
+
+def _heading(pdf, line):
+    # Main headings (##)
+    pdf.ln(3)
+    pdf.use("B", 14, (0, 51, 102))
+    pdf.multi_cell(0, 8, line[3:].strip())
+    pdf.ln(2)
+
+def _subheading(pdf, line):
+    # Subheadings (###)
+    pdf.ln(2)
+    pdf.use("B", 12, (51, 51, 51))
+    pdf.multi_cell(0, 7, line[4:].strip())
+    pdf.ln(1)
+
+def _section_label(pdf, line):
+    # Section labels / keywords
+    pdf.ln(2)
+    pdf.use("B", 12, (0, 51, 102))
+    pdf.multi_cell(0, 7, line.upper())
+    pdf.ln(1)
+
+def _separator(pdf, line):
+    # Separator lines (=== or ---)
+    pdf.ln(1)
+    pdf.set_draw_color(0, 51, 102)
+    pdf.line(pdf.l_margin, pdf.get_y(), pdf.w - pdf.r_margin, pdf.get_y())
+    pdf.ln(2)
+
+def _question_answer(pdf, line):
+    # Question/Answer lines (bold label with Bloom's level)
+    pdf.ln(1)
+    pdf.use("B", 11, (0, 51, 102))
+    pdf.multi_cell(0, 6, line)
+
+def _bold(pdf, line):
+    # Bold text (**text**)
+    pdf.use("B", 11)
+    pdf.multi_cell(0, 6, line.replace("**", ""))
+
+def _bullet(pdf, line):
+    # Bullet points (-, *)
+    pdf.set_x(20)
+    pdf.use()
+    pdf.multi_cell(0, 6, f"- {line[2:].strip()}")
+
+def _numbered(pdf, line):
+    # Numbered lists (e.g., 1. or 1))
+    pdf.set_x(20)
+    pdf.use()
+    pdf.multi_cell(0, 6, line)
+
+_HANDLERS = {
+    "h2": _heading,
+    "h3": _subheading,
+    "section": _section_label,
+    "sep": _separator,
+    "qa": _question_answer,
+    "bold": _bold,
+    "bullet": _bullet,
+    "num": _numbered,
+}
+
 def create_pdf(title: str, content: str) -> BytesIO:
     """Create a formatted PDF and return as BytesIO (no file saved to disk)"""
-    pdf = PDF()
-    pdf.set_auto_page_break(auto=True, margin=20)
-    pdf.title = title.encode("latin-1", "ignore").decode("latin-1")
+    pdf = PDF(title)
     pdf.add_page()
-    pdf.set_left_margin(15)
-    pdf.set_right_margin(15)
-
-    # Replace common Unicode characters with ASCII equivalents
-    unicode_replacements = {
-        '\u2022': '-',  # bullet point
-        '\u2013': '-',  # en dash
-        '\u2014': '--', # em dash
-        '\u2018': "'",  # left single quote
-        '\u2019': "'",  # right single quote
-        '\u201c': '"',  # left double quote
-        '\u201d': '"',  # right double quote
-        '\u2026': '...', # ellipsis
-        '\u00b0': ' degrees', # degree symbol
-        '\u00d7': 'x',  # multiplication sign
-        '\u00f7': '/',  # division sign
-        '\u2192': '->',  # right arrow
-        '\u2190': '<-',  # left arrow
-        '\u2264': '<=',  # less than or equal
-        '\u2265': '>=',  # greater than or equal
-        '\u2260': '!=',  # not equal
-    }
-    
-    for unicode_char, ascii_char in unicode_replacements.items():
-        content = content.replace(unicode_char, ascii_char)
+
+    # Replace common Unicode characters with ASCII equivalents (single pass)
+    content = content.translate(_UNICODE_REPLACEMENTS)
     
     # Make text latin-1 safe (remove any remaining non-latin-1 characters)
-    safe_content = content.encode("latin-1", "ignore").decode("latin-1")
+    safe_content = _latin1_safe(content)
     
     lines = safe_content.split("\n")
-    
+
+    # Consecutive plain paragraph lines are written with a single multi_cell call
+    paragraph = []
+
+    def flush():
+        if paragraph:
+            pdf.use()
+            pdf.multi_cell(0, 6, "\n".join(paragraph))
+            paragraph.clear()
+
     for line in lines:
-        raw_line = line
         line = line.strip()
         
         if not line:
+            flush()
             pdf.ln(4)
             continue
-        
-        # Main headings (##)
-        if line.startswith("## "):
-            pdf.ln(3)
-            pdf.set_font("Helvetica", "B", 14)
-            pdf.set_text_color(0, 51, 102)
-            pdf.multi_cell(0, 8, line[3:].strip())
-            pdf.ln(2)
-            pdf.set_font("Helvetica", size=11)
-            pdf.set_text_color(0, 0, 0)
-        
-        # Subheadings (###)
-        elif line.startswith("### "):
-            pdf.ln(2)
-            pdf.set_font("Helvetica", "B", 12)
-            pdf.set_text_color(51, 51, 51)
-            pdf.multi_cell(0, 7, line[4:].strip())
-            pdf.ln(1)
-            pdf.set_font("Helvetica", size=11)
-            pdf.set_text_color(0, 0, 0)
-        
-        # Section labels / keywords
-        elif re.match(r"^(INSTRUCTIONS|QUESTIONS|ANSWER KEY|MARK DISTRIBUTION|BLOOM'?S?\s+TAXONOMY\s+DISTRIBUTION|QUESTION\s+PAPER|SECTION\s+\d+)\s*:?$", line, re.IGNORECASE):
-            pdf.ln(2)
-            pdf.set_font("Helvetica", "B", 12)
-            pdf.set_text_color(0, 51, 102)
-            pdf.multi_cell(0, 7, line.upper())
-            pdf.ln(1)
-            pdf.set_font("Helvetica", size=11)
-            pdf.set_text_color(0, 0, 0)
-        
-        # Separator lines (=== or ---)
-        elif re.match(r'^[=\-]{3,}$', line):
-            pdf.ln(1)
-            pdf.set_draw_color(0, 51, 102)
-            pdf.line(pdf.l_margin, pdf.get_y(), pdf.w - pdf.r_margin, pdf.get_y())
-            pdf.ln(2)
-
-        # Question/Answer lines (bold label with Bloom's level)
-        elif re.match(r"^(Question\s*\d+|Answer\s*\d+)\b", line, re.IGNORECASE):
-            pdf.ln(1)
-            pdf.set_font("Helvetica", "B", 11)
-            pdf.set_text_color(0, 51, 102)
-            pdf.multi_cell(0, 6, line)
-            pdf.set_font("Helvetica", size=11)
-            pdf.set_text_color(0, 0, 0)
-
-        # Bold text (**text**)
-        elif "**" in line:
-            pdf.set_font("Helvetica", "B", 11)
-            clean_line = line.replace("**", "")
-            pdf.multi_cell(0, 6, clean_line)
-            pdf.set_font("Helvetica", size=11)
-        
-        # Bullet points (-, *, •)
-        elif line.startswith(("- ", "* ")):
-            bullet_text = line[2:].strip()
-            pdf.set_x(20)
-            pdf.set_font("Helvetica", size=11)
-            pdf.multi_cell(0, 6, f"- {bullet_text}")
-        
-        # Numbered lists (e.g., 1. or 1))
-        elif re.match(r'^\d+[\.)]', line):
-            pdf.set_x(20)
-            pdf.set_font("Helvetica", size=11)
-            pdf.multi_cell(0, 6, line)
-        
+
+        classifier = _FIRST_CHAR.get(line[0])
+        match = classifier.match(line) if classifier else None
+        kind = match.lastgroup if match else None
+        # Lines carrying **bold** markup render bold even when they look like list items
+        if kind in (None, "bullet", "num") and "**" in line:
+            kind = "bold"
+
         # Regular paragraphs
-        else:
-            pdf.set_font("Helvetica", size=11)
-            pdf.set_text_color(0, 0, 0)
-            pdf.multi_cell(0, 6, line)
+        if kind is None:
+            paragraph.append(line)
             # Add small spacing after paragraphs
             if len(line) > 50:  # Only for longer paragraphs
+                flush()
                 pdf.ln(1)
+            continue
+
+        flush()
+        _HANDLERS[kind](pdf, line)
+
+    flush()
     
-    # Return as BytesIO instead of saving to disk
-    pdf_output = BytesIO()
-    output_bytes = pdf.output(dest='S')
-    
-    # Handle both fpdf (returns str) and fpdf2 (returns bytes)
-    if isinstance(output_bytes, str):
-        pdf_output.write(output_bytes.encode('latin-1', 'ignore'))
-    else:
-        pdf_output.write(output_bytes)
-    
-    pdf_output.seek(0)
-    return pdf_output
+    # Return as BytesIO instead of saving to disk; fpdf 1.7 returns a latin-1 str
+    return BytesIO(pdf.output(dest='S').encode('latin-1', 'ignore'))
@@ -1,93 +1,330 @@
 import streamlit as st
-from gemini_llm import GeminiLLM
+from gemini_llm import GeminiLLM, SemanticCache
 from pdf_helper import create_pdf
+from bloom_helper import BLOOM_LEVELS, detect_bloom_level
 from io import BytesIO
+import pandas as pd
 import base64
 import zipfile
-import pdfplumber
-import docx
-from pdf2image import convert_from_bytes
-import pytesseract
-from PIL import Image
 import hashlib
-import time
+import os
 import re
+import secrets
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 
 # ================== HELPERS ==================
 
-def img_to_base64(path):
-    with open(path, "rb") as f:
-        return base64.b64encode(f.read()).decode()
+# The PDF, OCR and DOCX libraries are imported inside the helpers that use them,
+# so "Enter Topic" sessions (and app start-up) never load them
+
+# A PDF whose text layer yields fewer characters than this is treated as scanned
+MIN_TEXT_CHARS = 50
+
+# Scanned syllabi are plain text blocks: 150 DPI is enough for Tesseract on 10pt+
+# body text, and PSM 6 (single uniform block) with the LSTM-only engine skips
+# layout analysis
+OCR_DPI = 150
+OCR_CONFIG = "--psm 6 --oem 1 -l eng"
+
+# Scans are rasterized and OCR'd a batch at a time (one page per OCR worker),
+# stopping once enough syllabus text is captured or OCR_MAX_PAGES is reached
+OCR_MAX_PAGES = 10
+OCR_WORKERS = max(1, min(8, os.cpu_count() or 1))
+OCR_BATCH_PAGES = OCR_WORKERS
+OCR_TARGET_CHARS = 4000
+
+# Adaptive threshold before OCR: a pixel is ink when it is darker than the mean
+# of its ~31px neighbourhood by more than the offset
+OCR_THRESHOLD_RADIUS = 15
+OCR_THRESHOLD_OFFSET = 10
+
+# Pages are already OCR'd in parallel; keep each Tesseract single-threaded so
+# its OpenMP pool does not oversubscribe the cores
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+# Section markers used to split the generated learning pack, combined into one
+# alternation so a single scan finds every section; the group name is the section
+SECTIONS_PATTERN = re.compile(
+    "|".join(
+        f"(?P<{name}>{pattern})"
+        for name, pattern in {
+            "notes": r"(?:^|\n)\s*(?:SECTION\s*1\s*:\s*STRUCTURED\s*NOTES|1\.\s*STRUCTURED\s*NOTES)",
+            "roadmap": r"(?:^|\n)\s*(?:SECTION\s*2\s*:\s*LEARNING\s*ROADMAP|2\.\s*LEARNING\s*ROADMAP)",
+            "resources": r"(?:^|\n)\s*(?:SECTION\s*3\s*:\s*IMPORTANT\s*RESOURCES|3\.\s*IMPORTANT\s*RESOURCES)",
+            "qbank": r"(?:^|\n)\s*(?:SECTION\s*4\s*:\s*QUESTION\s*BANK\s*WITH\s*ANSWERS|4\.\s*QUESTION\s*BANK\s*WITH\s*ANSWERS|4\.\s*QUESTION\s*BANK|SECTION\s*4\s*:\s*QUESTION\s*BANK|SECTION\s*1\s*:\s*QUESTIONS\s*ONLY\s*\(FOR\s*STUDENTS\)|SECTION\s*1\s*:\s*QUESTION\s*PAPER)",
+        }.items()
+    ),
+    re.IGNORECASE,
+)
+QPAPER_START_PATTERN = re.compile(
+    r"(?:SECTION\s*1\s*:\s*QUESTIONS\s*ONLY|SECTION\s*1\s*:\s*QUESTION\s*PAPER|QUESTIONS\s*ONLY\s*\(FOR\s*STUDENTS\))",
+    re.IGNORECASE,
+)
 
-def is_quota_exhausted(text: str) -> bool:
-    return text.startswith("QUOTA_EXHAUSTED")
+# Question bank split: section headers to strip, the answer key marker, and
+# per-question/answer blocks for responses without markers
+QUESTIONS_HEADER_PATTERN = re.compile(r"SECTION\s*1.*?(?:QUESTIONS?:|$)", re.IGNORECASE | re.DOTALL)
+ANSWERS_HEADER_PATTERN = re.compile(r"SECTION\s*2.*?(?:ANSWER\s*KEY:?|$)", re.IGNORECASE | re.DOTALL)
+ANSWER_KEY_PATTERN = re.compile(r"ANSWER\s*KEY\s*:?", re.IGNORECASE)
+ANSWER_BLOCK_PATTERN = re.compile(
+    r"Answer\s*\d+\s*[:.)-]\s*(.*?)(?=\n\s*Answer\s*\d+\s*[:.)-]|\Z)",
+    re.IGNORECASE | re.DOTALL,
+)
+QUESTION_BLOCK_PATTERN = re.compile(
+    r"Question\s*\d+\s*\([^\n]*\)\s*[:.)-]\s*(.*?)(?=\n\s*Question\s*\d+\s*\(|\Z)",
+    re.IGNORECASE | re.DOTALL,
+)
 
-def extract_syllabus_text(uploaded_file):
+# Static assets are loaded once per (logo, css) mtime pair: reruns skip the disk
+# read and encoding, and an edited file is picked up without restarting the
+# server. cache_resource hands back the same dict instead of unpickling a copy.
+
+def file_mtime(path):
     try:
-        file_type = uploaded_file.name.split(".")[-1].lower()
+        return os.path.getmtime(path)
+    except OSError:
+        return None
 
-        if file_type == "pdf":
-            text = ""
-            pdf_bytes = uploaded_file.read()
-            pdf_stream = BytesIO(pdf_bytes)
-            
-            # Try normal text extraction first
-            try:
-                with pdfplumber.open(pdf_stream) as pdf:
-                    for page in pdf.pages:
-                        t = page.extract_text()
-                        if t:
-                            text += t + "\n"
-                
-                if text.strip():
-                    return text.strip()
-            except Exception as e:
-                st.warning(f"⚠️ Text extraction failed: {str(e)[:80]}")
-            
-            # If text extraction failed or returned empty, try OCR
-            st.info("🔄 Attempting OCR on PDF (scanned document)...")
-            try:
-                images = convert_from_bytes(pdf_bytes, first_page=1, last_page=10)
-                for img in images:
-                    ocr_text = pytesseract.image_to_string(img)
-                    if ocr_text:
-                        text += ocr_text + "\n"
-                
-                if text.strip():
-                    st.success("✅ OCR extraction successful")
-                    return text.strip()
-                else:
-                    raise ValueError("OCR returned no text")
-            except Exception as e:
-                st.warning(f"⚠️ OCR failed: {str(e)[:80]} (Tesseract not installed?)")
-                raise ValueError("PDF appears to be empty or corrupted. Please ensure it contains readable text or images.")
+@st.cache_resource(show_spinner=False)
+def load_assets(logo_mtime, css_mtime):
+    with open("logo.png", "rb") as f:
+        logo = base64.b64encode(f.read()).decode()
+    css = ""
+    if css_mtime is not None:  # CSS file optional
+        with open("new.css") as f:
+            css = f.read()
+    return {"logo": logo, "css": css}
+
+def binarize(image):
+    """Grayscale + adaptive threshold, so Tesseract gets black text on a clean white page."""
+    from PIL import ImageChops, ImageFilter
+
+    gray = image.convert("L")
+    local_mean = gray.filter(ImageFilter.BoxBlur(OCR_THRESHOLD_RADIUS))
+    return ImageChops.subtract(local_mean, gray).point(lambda v: 0 if v > OCR_THRESHOLD_OFFSET else 255)
+
+def page_digest(image) -> str:
+    # Hashing the raw pixels takes a few ms; OCR of the page takes hundreds
+    header = f"{image.mode}{image.size}".encode()
+    return hashlib.blake2b(header + image.tobytes(), digest_size=16).hexdigest()
+
+# Process-wide LRU of page digest -> OCR text. A plain locked dict rather than
+# st.cache_data, because it is filled from OCR worker threads, which have no
+# script run context
+PAGE_CACHE_SIZE = 256
+_page_text_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+
+def cached_page_text(digest: str, image, recognize) -> str:
+    # Keyed on the page digest only, so a page seen before (a re-upload, or the
+    # same scan inside another file) skips Tesseract
+    with _page_cache_lock:
+        if digest in _page_text_cache:
+            _page_text_cache.move_to_end(digest)
+            return _page_text_cache[digest]
+
+    text = recognize(binarize(image))
+    with _page_cache_lock:
+        _page_text_cache[digest] = text
+        _page_text_cache.move_to_end(digest)
+        while len(_page_text_cache) > PAGE_CACHE_SIZE:
+            _page_text_cache.popitem(last=False)
+    return text
+
+def ocr_pages(images):
+    """OCR page images in parallel and return their text in page order."""
+    workers = max(1, min(OCR_WORKERS, len(images)))
 
-        elif file_type == "docx":
-            try:
-                doc = docx.Document(uploaded_file)
-                text = "\n".join(p.text for p in doc.paragraphs if p.text.strip())
-                if text.strip():
-                    return text
-                raise ValueError("No text found in DOCX")
-            except Exception as e:
-                raise ValueError(f"DOCX error: {str(e)[:80]}")
+    try:
+        from tesserocr import PyTessBaseAPI, PSM, OEM
+    except ImportError:  # needs the Tesseract C library; pytesseract still works via the CLI
+        PyTessBaseAPI = None
+
+    if PyTessBaseAPI is None:
+        import pytesseract
+
+        # pytesseract runs one tesseract subprocess per page, so threads OCR pages in parallel
+        recognize = partial(pytesseract.image_to_string, config=OCR_CONFIG)
+
+        def ocr_page(image):
+            return cached_page_text(page_digest(image), image, recognize)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(ocr_page, images))
+
+    # tesserocr loads the model once per API handle and releases the GIL while recognizing,
+    # so each worker keeps one handle (the API is not thread-safe) for its share of the pages.
+    # The handle is opened on the first cache miss, so fully cached shares never load the model.
+    def ocr_share(share):
+        api = None
+
+        def recognize(image):
+            nonlocal api
+            if api is None:
+                api = PyTessBaseAPI(lang="eng", psm=PSM.SINGLE_BLOCK, oem=OEM.LSTM_ONLY)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+
+        try:
+            return [cached_page_text(page_digest(image), image, recognize) for image in share]
+        finally:
+            if api is not None:
+                api.End()
+
+    pages = [""] * len(images)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for w, texts in enumerate(executor.map(ocr_share, [images[w::workers] for w in range(workers)])):
+            pages[w::workers] = texts
+    return pages
+
+def pdf_page_texts(file_bytes: bytes):
+    """Yield the text layer of each PDF page."""
+    try:
+        import pymupdf
+    except ImportError:  # pdfplumber is much slower (pure-Python pdfminer) but needs no binary wheel
+        pymupdf = None
 
-        elif file_type == "txt":
-            try:
-                text = uploaded_file.read().decode("utf-8", errors="ignore")
-                if text.strip():
-                    return text
-                raise ValueError("TXT file is empty")
-            except Exception as e:
-                raise ValueError(f"TXT error: {str(e)[:80]}")
+    if pymupdf is not None:
+        with pymupdf.open(stream=file_bytes, filetype="pdf") as pdf:
+            for page in pdf:
+                yield page.get_text("text")
+    else:
+        import pdfplumber
 
-        else:
-            raise ValueError(f"Unsupported file type: .{file_type} (supported: pdf, docx, txt)")
+        with pdfplumber.open(BytesIO(file_bytes)) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text()
+
+def is_quota_exhausted(text: str) -> bool:
+    return text.startswith("QUOTA_EXHAUSTED")
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def _extract_cached(file_bytes: bytes, file_type: str) -> str:
+    # Keyed on the file bytes, so reruns with the same upload skip parsing and OCR.
+    # Failures raise and are therefore never cached.
+    if file_type == "pdf":
+        # Page texts are collected and joined once instead of growing a string per page
+        parts = []
+        # Only a completed text pass knows the page count
+        page_count = None
+        
+        # Try normal text extraction first
+        try:
+            pages_read = 0
+            for pages_read, t in enumerate(pdf_page_texts(file_bytes), start=1):
+                if t:
+                    parts.append(t)
+            page_count = pages_read
+        except Exception as e:
+            st.warning(f"⚠️ Text extraction failed: {str(e)[:80]}")
+        
+        text = "\n".join(parts).strip()
+        if len(text) >= MIN_TEXT_CHARS:
+            return text
+        
+        # If text extraction failed or returned empty, try OCR
+        st.info("🔄 Attempting OCR on PDF (scanned document)...")
+        try:
+            from pdf2image import convert_from_bytes
+
+            last_page = min(page_count or OCR_MAX_PAGES, OCR_MAX_PAGES)
+            # A thin text layer (watermark, running header) would only duplicate what
+            # OCR reads from the same pages; it stays in text as the fallback if OCR fails
+            ocr_parts = []
+            ocr_chars = 0
+            for first_page in range(1, last_page + 1, OCR_BATCH_PAGES):
+                images = convert_from_bytes(
+                    file_bytes,
+                    first_page=first_page,
+                    last_page=min(first_page + OCR_BATCH_PAGES - 1, last_page),
+                    dpi=OCR_DPI,
+                    # Raw 8-bit gray (PGM): lossless like PNG without the encode/decode
+                    fmt="ppm",
+                    grayscale=True,
+                    thread_count=max(1, (os.cpu_count() or 1) - 1),
+                )
+                ocr_texts = [page_text for page_text in ocr_pages(images) if page_text]
+                ocr_parts.extend(ocr_texts)
+                ocr_chars += sum(map(len, ocr_texts))
+                # A short batch means the document ended (page count unknown if PyMuPDF failed)
+                document_ended = len(images) < OCR_BATCH_PAGES
+                # Release this batch's page bitmaps before the next batch is rasterized,
+                # so at most one batch is held in memory
+                del images
+                if ocr_chars >= OCR_TARGET_CHARS or document_ended:
+                    break
+            ocr_text = "\n".join(ocr_parts).strip()
+            
+            if ocr_text:
+                st.success("✅ OCR extraction successful")
+                return ocr_text
+            else:
+                raise ValueError("OCR returned no text")
+        except Exception as e:
+            st.warning(f"⚠️ OCR failed: {str(e)[:80]} (Tesseract not installed?)")
+            if text:
+                return text
+            raise ValueError("PDF appears to be empty or corrupted. Please ensure it contains readable text or images.")
+
+    elif file_type == "docx":
+        try:
+            import docx
+
+            doc = docx.Document(BytesIO(file_bytes))
+            text = "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+            if text.strip():
+                return text
+            raise ValueError("No text found in DOCX")
+        except Exception as e:
+            raise ValueError(f"DOCX error: {str(e)[:80]}")
+
+    elif file_type == "txt":
+        try:
+            text = file_bytes.decode("utf-8", errors="ignore")
+            if text.strip():
+                return text
+            raise ValueError("TXT file is empty")
+        except Exception as e:
+            raise ValueError(f"TXT error: {str(e)[:80]}")
+
+    else:
+        raise ValueError(f"Unsupported file type: .{file_type} (supported: pdf, docx, txt)")
+
+def sniff_file_type(file_bytes: bytes, file_name: str) -> str:
+    # Trust the content over the name, so a mislabeled PDF is not treated as
+    # text (or a text file sent down the OCR path). The %PDF- header must open the
+    # file, after an optional BOM or whitespace; a file that merely mentions it stays text
+    if file_bytes[:1024].lstrip(b"\xef\xbb\xbf \t\r\n").startswith(b"%PDF-"):
+        return "pdf"
+    if file_bytes.startswith(b"PK\x03\x04"):
+        try:
+            with zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+                archive.getinfo("word/document.xml")
+            return "docx"
+        except (zipfile.BadZipFile, KeyError):
+            pass
+    return os.path.splitext(file_name)[1].lstrip(".").lower()
+
+def extract_syllabus_text(uploaded_file):
+    try:
+        # getvalue() returns the whole upload regardless of the read position
+        file_bytes = uploaded_file.getvalue()
+        return _extract_cached(file_bytes, sniff_file_type(file_bytes, uploaded_file.name))
     
     except Exception as e:
         st.error(f"❌ Error extracting text: {str(e)}")
         return None
 
+@lru_cache(maxsize=32)
+def render_pdf(title: str, content: str) -> bytes:
+    # Identical sections (e.g. a repeated generation served from the LLM cache) reuse the PDF.
+    # lru_cache rather than st.cache_data: this runs on pool threads without a script
+    # run context, and the immutable bytes are safe to share between sessions
+    return create_pdf(title, content).getvalue()
+
 # ================== PAGE CONFIG ==================
 
 st.set_page_config(
@@ -99,11 +336,9 @@ st.set_page_config(
 
 # ================== LOAD CUSTOM CSS ==================
 
-try:
-    with open("new.css") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-except FileNotFoundError:
-    pass  # CSS file optional
+assets = load_assets(file_mtime("logo.png"), file_mtime("new.css"))
+if assets["css"]:
+    st.markdown(f"<style>{assets['css']}</style>", unsafe_allow_html=True)
 
 # ================== SESSION STATE ==================
 
@@ -115,10 +350,14 @@ if "bloom_taxonomy" not in st.session_state:
     st.session_state["bloom_taxonomy"] = []
 if "custom_questions" not in st.session_state:
     st.session_state["custom_questions"] = []
-if "pdfs" not in st.session_state:
-    st.session_state["pdfs"] = {}
+if "active_custom_questions" not in st.session_state:
+    st.session_state["active_custom_questions"] = []
+if "pdf_bytes" not in st.session_state:
+    st.session_state["pdf_bytes"] = {}
 if "sections" not in st.session_state:
     st.session_state["sections"] = {}
+if "zip_bytes" not in st.session_state:
+    st.session_state["zip_bytes"] = b""
 if "generation_id" not in st.session_state:
     st.session_state["generation_id"] = ""
 
@@ -130,11 +369,22 @@ if not st.session_state["gemini_api_key"]:
 
 # ================== INIT GEMINI ==================
 
-gemini = GeminiLLM(api_key=st.session_state["gemini_api_key"])
+@st.cache_resource(show_spinner=False)
+def get_gemini(api_key: str) -> GeminiLLM:
+    # One client (and its keep-alive connection pool) per API key for the whole server
+    return GeminiLLM(api_key=api_key)
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache(api_key: str) -> SemanticCache:
+    # Near-duplicate requests from any session reuse an earlier learning pack
+    return SemanticCache(get_gemini(api_key))
+
+gemini = get_gemini(st.session_state["gemini_api_key"])
+semantic_cache = get_semantic_cache(st.session_state["gemini_api_key"])
 
 # ================== HEADER ==================
 
-logo = img_to_base64("logo.png")
+logo = assets["logo"]
 
 st.markdown(f"""
 <div style="display:flex;align-items:center;justify-content:center;">
@@ -183,15 +433,38 @@ extra_prompt = st.text_area(
 
 input_ready = (mode == "Enter Topic" and bool(topic.strip())) or (mode == "Upload Syllabus" and bool(syllabus_text.strip()))
 
-# Define BLOOM_LEVELS globally (needed for validation even when controls are hidden)
-BLOOM_LEVELS = [
-    "Remembering",
-    "Understanding",
-    "Applying",
-    "Analyzing",
-    "Evaluating",
-    "Creating"
-]
+def edit_rows(list_key, column_config, default_row=None):
+    """Render a builder list as one data editor and return the edited rows.
+
+    With a default_row, the list never drops below one row: deleting every row
+    restores the default.
+    """
+    resets_key = f"{list_key}_resets"
+    editor_key = f"{list_key}_editor{st.session_state.get(resets_key, 0)}"
+    # The editor stores edits relative to the data it was created with, so that
+    # base stays fixed while the widget lives; it is re-seeded from the list
+    # whenever the widget was not rendered on the previous run
+    if editor_key not in st.session_state:
+        st.session_state[f"{list_key}_base"] = pd.DataFrame(
+            st.session_state[list_key], columns=list(column_config)
+        )
+    edited = st.data_editor(
+        st.session_state[f"{list_key}_base"],
+        column_config=column_config,
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        key=editor_key,
+    )
+    # Rows added but left incomplete are ignored
+    rows = edited.dropna().to_dict("records")
+    if not rows and default_row is not None:
+        # The old widget would re-apply its deletions to a re-seeded base, so the
+        # restored row gets a fresh editor key
+        st.session_state[list_key] = [dict(default_row)]
+        st.session_state[resets_key] = st.session_state.get(resets_key, 0) + 1
+        st.rerun()
+    return rows
 
 # Initialize defaults
 active_custom_questions = []
@@ -199,208 +472,108 @@ generated_questions_count = 0
 custom_questions_count = 0
 total_questions = 0
 
-if input_ready:
-    # ================== QUESTION BUILDER ==================
-    
-    st.markdown("## 🧠 Question Pattern Builder")
-    
-    for i, qp in enumerate(st.session_state["question_patterns"]):
-        c1, c2, c3, c4 = st.columns([3, 3, 0.6, 0.6])
-
-        with c1:
-            qp["count"] = st.number_input(
-                "Questions",
-                min_value=0,
-                value=qp["count"],
-                key=f"qc{i}"
-            )
-
-        with c2:
-            qp["marks"] = st.number_input(
-                "Marks per question",
-                min_value=1,
-                value=qp["marks"],
-                key=f"qm{i}"
-            )
-
-        with c3:
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            if st.button("➕", key=f"add{i}", use_container_width=True):
-                st.session_state["question_patterns"].append(
-                    {"count": 2, "marks": 5}
-                )
-                st.rerun()
-
-        with c4:
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            if st.button("➖", key=f"remove{i}", use_container_width=True):
-                if len(st.session_state["question_patterns"]) > 1:
-                    st.session_state["question_patterns"].pop(i)
-                    st.rerun()
-    
-    # Calculate generated questions from pattern menu
-    generated_questions_count = sum(qp["count"] for qp in st.session_state["question_patterns"])
-    
-    # ================== CUSTOM QUESTIONS BUILDER ==================
+@st.fragment
+def render_builders():
+    # Each builder is one data editor, and edits are batched in one form so typing
+    # does not rerun the whole script; as a fragment, applying them reruns only
+    # the builders
+    with st.form("builders", clear_on_submit=False, border=False):
+        # ================== QUESTION BUILDER ==================
     
-    st.markdown("## ✍️ Custom Questions (Optional)")
-    st.markdown("Add teacher-framed questions to include along with generated questions.")
-    
-    BLOOM_KEYWORDS = {
-        "Remembering": ["define", "list", "name", "state", "identify", "recall", "what is", "mention"],
-        "Understanding": ["explain", "summarize", "describe", "differentiate", "classify", "interpret", "outline"],
-        "Applying": ["apply", "solve", "use", "demonstrate", "calculate", "implement", "show how"],
-        "Analyzing": ["analyze", "compare", "contrast", "examine", "categorize", "investigate", "why"],
-        "Evaluating": ["evaluate", "justify", "critique", "assess", "argue", "recommend", "validate"],
-        "Creating": ["design", "create", "develop", "construct", "propose", "formulate", "build"],
-    }
-    
-    def detect_bloom_level(question_text: str) -> str:
-        text = (question_text or "").strip().lower()
-        if not text:
-            return "Not detected"
-    
-        scores = {level: 0 for level in BLOOM_KEYWORDS.keys()}
-        for level, keywords in BLOOM_KEYWORDS.items():
-            for keyword in keywords:
-                if text.startswith(keyword):
-                    scores[level] += 3
-                elif keyword in text:
-                    scores[level] += 1
-    
-        best_level = max(scores, key=scores.get)
-        return best_level if scores[best_level] > 0 else "Understanding"
-    
-    for i, cq in enumerate(st.session_state["custom_questions"]):
-        c1, c2, c3, c4, c5 = st.columns([5, 1.2, 2.4, 0.7, 0.7])
-    
-        with c1:
-            cq["text"] = st.text_input(
-                "Custom Question",
-                value=cq.get("text", ""),
-                key=f"custom_q_{i}",
-                placeholder="e.g., Explain normalization with suitable examples."
-            )
-    
-        with c2:
-            cq["marks"] = st.number_input(
-                "Marks",
-                min_value=1,
-                value=int(cq.get("marks", 2)),
-                key=f"custom_marks_{i}"
-            )
-    
-        with c3:
-            detected_level = detect_bloom_level(cq.get("text", ""))
-            cq["bloom_level"] = detected_level
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            st.caption(f"Detected level: **{detected_level.lower()}**")
+        st.markdown("## 🧠 Question Pattern Builder")
+
+        st.session_state["question_patterns"] = [
+            {"count": int(qp["count"]), "marks": int(qp["marks"])}
+            for qp in edit_rows("question_patterns", {
+                "count": st.column_config.NumberColumn("Questions", min_value=0, step=1, default=2, required=True),
+                "marks": st.column_config.NumberColumn("Marks per question", min_value=1, step=1, default=5, required=True),
+            }, default_row={"count": 4, "marks": 2})
+        ]
     
-        with c4:
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            if st.button("➕", key=f"add_custom_{i}", use_container_width=True):
-                st.session_state["custom_questions"].append({"text": "", "marks": 2, "bloom_level": "Understanding"})
-                st.rerun()
+        # Calculate generated questions from pattern menu
+        generated_questions_count = sum(qp["count"] for qp in st.session_state["question_patterns"])
     
-        with c5:
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            if st.button("➖", key=f"remove_custom_{i}", use_container_width=True):
-                st.session_state["custom_questions"].pop(i)
-                st.rerun()
+        # ================== CUSTOM QUESTIONS BUILDER ==================
     
-    if len(st.session_state["custom_questions"]) == 0:
-        if st.button("➕ Add Custom Question", use_container_width=True):
-            st.session_state["custom_questions"].append({"text": "", "marks": 2, "bloom_level": "Understanding"})
-            st.rerun()
+        st.markdown("## ✍️ Custom Questions (Optional)")
+        st.markdown("Add teacher-framed questions to include along with generated questions.")
+
+        st.session_state["custom_questions"] = [
+            {
+                "text": cq["text"],
+                "marks": int(cq["marks"]),
+                "bloom_level": detect_bloom_level(cq["text"])
+            }
+            for cq in edit_rows("custom_questions", {
+                "text": st.column_config.TextColumn("Custom Question", width="large", default="", required=True),
+                "marks": st.column_config.NumberColumn("Marks", min_value=1, step=1, default=2, required=True),
+            })
+        ]
     
-    active_custom_questions = [
-    {
-        "text": q.get("text", "").strip(),
-        "marks": int(q.get("marks", 1)),
-        "bloom_level": q.get("bloom_level") if q.get("bloom_level") in BLOOM_LEVELS else "Understanding"
-    }
-    for q in st.session_state["custom_questions"]
-    if q.get("text", "").strip()
-]
-
-    custom_questions_count = len(active_custom_questions)
-    total_questions = generated_questions_count + custom_questions_count
+        # Built only when the builders render; the generate step reads it back from session state
+        active_custom_questions = [
+            {
+                "text": q.get("text", "").strip(),
+                "marks": int(q.get("marks", 1)),
+                "bloom_level": q.get("bloom_level") if q.get("bloom_level") in BLOOM_LEVELS else "Understanding"
+            }
+            for q in st.session_state["custom_questions"]
+            if q.get("text", "").strip()
+        ]
+        st.session_state["active_custom_questions"] = active_custom_questions
+
+        for i, q in enumerate(active_custom_questions, start=1):
+            st.caption(f"Custom question {i} detected level: **{q['bloom_level'].lower()}**")
+
+        custom_questions_count = len(active_custom_questions)
+        total_questions = generated_questions_count + custom_questions_count
     
-    st.info(
-        f"📊 **Total Questions: {total_questions}**  |  Pattern Menu: {generated_questions_count}  |  Custom: {custom_questions_count}"
-    )
+        st.info(
+            f"📊 **Total Questions: {total_questions}**  |  Pattern Menu: {generated_questions_count}  |  Custom: {custom_questions_count}"
+        )
     
-    if active_custom_questions:
-        st.success(f"✅ Custom questions added: {len(active_custom_questions)}")
+        if active_custom_questions:
+            st.success(f"✅ Custom questions added: {len(active_custom_questions)}")
     
-    # ================== BLOOM'S TAXONOMY BUILDER ==================
+        # ================== BLOOM'S TAXONOMY BUILDER ==================
     
-    st.markdown("## 🎯 Bloom's Taxonomy Distribution (Optional)")
-    st.markdown("Distribute **Pattern Menu Questions** across cognitive levels according to Bloom's Taxonomy")
-    st.info("ℹ️ This applies only to Pattern Menu questions. Custom questions use their auto-detected levels.")
-
-    for i, taxonomy in enumerate(st.session_state["bloom_taxonomy"]):
-        c1, c2, c3, c4 = st.columns([3, 3, 0.6, 0.6])
-        
-        with c1:
-            taxonomy["level"] = st.selectbox(
-                "Taxonomy Level",
-                BLOOM_LEVELS,
-                index=BLOOM_LEVELS.index(taxonomy["level"]) if taxonomy["level"] in BLOOM_LEVELS else 0,
-                key=f"tax_level_{i}"
-            )
-        
-        with c2:
-            taxonomy["count"] = st.number_input(
-                "Number of Questions",
-                min_value=1,
-                max_value=max(generated_questions_count, 1),
-                value=min(taxonomy["count"], max(generated_questions_count, 1)),
-                key=f"tax_count_{i}"
-            )
-        
-        with c3:
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            if st.button("➕", key=f"add_tax_{i}", use_container_width=True):
-                st.session_state["bloom_taxonomy"].append({"level": "Understanding", "count": 1})
-                st.rerun()
-        
-        with c4:
-            st.markdown("<div style='padding-top: 1.85rem;'></div>", unsafe_allow_html=True)
-            if st.button("➖", key=f"remove_tax_{i}", use_container_width=True):
-                st.session_state["bloom_taxonomy"].pop(i)
-                st.rerun()
-
-    if len(st.session_state["bloom_taxonomy"]) == 0:
-        if st.button("➕ Add Bloom's Taxonomy Distribution", use_container_width=True):
-            st.session_state["bloom_taxonomy"].append({"level": "Understanding", "count": 1})
-            st.rerun()
+        st.markdown("## 🎯 Bloom's Taxonomy Distribution (Optional)")
+        st.markdown("Distribute **Pattern Menu Questions** across cognitive levels according to Bloom's Taxonomy")
+        st.info("ℹ️ This applies only to Pattern Menu questions. Custom questions use their auto-detected levels.")
+
+        st.session_state["bloom_taxonomy"] = [
+            {"level": taxonomy["level"], "count": int(taxonomy["count"])}
+            for taxonomy in edit_rows("bloom_taxonomy", {
+                "level": st.column_config.SelectboxColumn("Taxonomy Level", options=BLOOM_LEVELS, default="Understanding", required=True),
+                "count": st.column_config.NumberColumn("Number of Questions", min_value=1, step=1, default=1, required=True),
+            })
+        ]
     
-    # Validate taxonomy distribution (only for pattern questions)
-    if st.session_state["bloom_taxonomy"] and generated_questions_count > 0:
-        taxonomy_total = sum(t["count"] for t in st.session_state["bloom_taxonomy"])
+        # Validate taxonomy distribution (only for pattern questions)
+        if st.session_state["bloom_taxonomy"] and generated_questions_count > 0:
+            taxonomy_total = sum(t["count"] for t in st.session_state["bloom_taxonomy"])
         
-        if taxonomy_total > generated_questions_count:
-            st.error(f"❌ Taxonomy distribution ({taxonomy_total}) exceeds pattern menu questions ({generated_questions_count})!")
-        elif taxonomy_total < generated_questions_count:
-            st.warning(f"⚠️ Taxonomy distribution ({taxonomy_total}) is less than pattern menu questions ({generated_questions_count}). Remaining {generated_questions_count - taxonomy_total} questions will be mixed.")
-        else:
-            st.success(f"✅ Taxonomy distribution matches pattern menu questions ({taxonomy_total}/{generated_questions_count})")
+            if taxonomy_total > generated_questions_count:
+                st.error(f"❌ Taxonomy distribution ({taxonomy_total}) exceeds pattern menu questions ({generated_questions_count})!")
+            elif taxonomy_total < generated_questions_count:
+                st.warning(f"⚠️ Taxonomy distribution ({taxonomy_total}) is less than pattern menu questions ({generated_questions_count}). Remaining {generated_questions_count - taxonomy_total} questions will be mixed.")
+            else:
+                st.success(f"✅ Taxonomy distribution matches pattern menu questions ({taxonomy_total}/{generated_questions_count})")
         
-        st.markdown("**Pattern Questions Distribution:**")
-        for t in st.session_state["bloom_taxonomy"]:
-            st.markdown(f"- {t['level']}: {t['count']} questions")
+            st.markdown("**Pattern Questions Distribution:**")
+            for t in st.session_state["bloom_taxonomy"]:
+                st.markdown(f"- {t['level']}: {t['count']} questions")
 
-def question_instruction(custom_qs):
-    marks_map = {}
+        st.form_submit_button("✅ Apply Changes", use_container_width=True)
 
-    for q in st.session_state["question_patterns"]:
-        marks = int(q["marks"])
-        marks_map[marks] = marks_map.get(marks, 0) + int(q["count"])
+if input_ready:
+    render_builders()
 
-    for q in custom_qs:
-        marks = int(q["marks"])
-        marks_map[marks] = marks_map.get(marks, 0) + 1
+def question_instruction(custom_qs):
+    marks_map = Counter()
+    for q in st.session_state["question_patterns"]:
+        marks_map[int(q["marks"])] += int(q["count"])
+    marks_map.update(int(q["marks"]) for q in custom_qs)
 
     return "\n".join(
         f"- {count} questions of {marks} marks each"
@@ -458,7 +631,7 @@ Include:
 - Websites/blogs
 """
 
-def assistant_prompt(topic):
+def assistant_prompt(topic, mark_distribution, taxonomy_dist, custom_dist, gen_q_count, custom_q_count, total_q):
     return f"""
 You are an exam paper setter. Create a complete question bank with answers for {topic}.
 
@@ -476,16 +649,16 @@ SECTION 1: QUESTIONS ONLY (FOR STUDENTS)
 - Do NOT look at answers while solving
 
 **MARK DISTRIBUTION:**
-{question_instruction()}
+{mark_distribution}
 
 **BLOOM'S TAXONOMY DISTRIBUTION:**
-{taxonomy_instruction()}
+{taxonomy_dist}
 
 **CUSTOM TEACHER-FRAMED QUESTIONS (MANDATORY TO INCLUDE):**
-{custom_questions_instruction()}
+{custom_dist}
 
 **QUESTIONS:**
-[Generate exactly {total_questions} questions in total: {generated_questions_count} from the pattern menu + {custom_questions_count} custom teacher-framed questions.]
+[Generate exactly {total_q} questions in total: {gen_q_count} from the pattern menu + {custom_q_count} custom teacher-framed questions.]
 [Include each custom teacher-framed question exactly once with its exact marks and Bloom's level as provided above, but do NOT label or separate them as custom in the final question paper.]
 [Treat all questions as one single question category in the final paper with a single mark distribution block.]
 [Ensure answer key contains exactly one matching answer for each question with same numbering and marks alignment.]
@@ -514,7 +687,9 @@ Answer 2 [Bloom's Level: Applying]:
 Make each answer comprehensive, include formulas, working, and diagrams descriptions where needed.
 """
 
-def master_prompt(topic_text, syllabus, instructions, gen_q_count, custom_q_count, total_q, custom_qs):
+def master_prompt(topic_text, syllabus, instructions, gen_q_count, custom_q_count, total_q,
+                  mark_distribution, taxonomy_dist, custom_dist):
+    # The instruction blocks are built once by the caller; this is plain formatting
     return f"""
 You are an academic expert.
 
@@ -528,13 +703,13 @@ INSTRUCTIONS:
 {instructions or "None"}
 
 QUESTION STRUCTURE:
-{question_instruction(custom_qs)}
+{mark_distribution}
 
 BLOOM'S TAXONOMY DISTRIBUTION:
-{taxonomy_instruction()}
+{taxonomy_dist}
 
 CUSTOM TEACHER-FRAMED QUESTIONS (MANDATORY TO INCLUDE):
-{custom_questions_instruction(custom_qs)}
+{custom_dist}
 
 RULES:
 - Strictly syllabus-based
@@ -569,10 +744,10 @@ INSTRUCTIONS:
 - Follow the given mark distribution
 
 MARK DISTRIBUTION:
-{question_instruction(custom_qs)}
+{mark_distribution}
 
 BLOOM'S TAXONOMY DISTRIBUTION:
-{taxonomy_instruction()}
+{taxonomy_dist}
 
 QUESTIONS:
 
@@ -596,22 +771,29 @@ Answer 2 [Bloom's Level: Applying]:
 # ================== GENERATE ==================
 
 if input_ready:
+    regenerate = st.checkbox(
+        "🔁 Regenerate (ignore cached results)",
+        help="Ask Gemini for a fresh pack even if an identical or near-identical request was answered before."
+    )
     if st.button("🚀 Generate Learning Pack", type="primary", use_container_width=True):
 
         # Calculate question totals for conditional generation
         generated_questions_count = sum(qp["count"] for qp in st.session_state["question_patterns"])
-        active_custom_questions = [
-            {
-                "text": q.get("text", "").strip(),
-                "marks": int(q.get("marks", 1)),
-                "bloom_level": q.get("bloom_level") if q.get("bloom_level", "Understanding") in BLOOM_LEVELS else "Understanding"
-            }
-            for q in st.session_state["custom_questions"]
-            if q.get("text", "").strip()
-        ]
+        active_custom_questions = st.session_state["active_custom_questions"]
         custom_questions_count = len(active_custom_questions)
         total_questions = generated_questions_count + custom_questions_count
 
+        # The builder only flags an over-allocated taxonomy; never send one to Gemini
+        taxonomy_total = sum(t["count"] for t in st.session_state["bloom_taxonomy"])
+        if taxonomy_total > generated_questions_count:
+            st.error(f"❌ Taxonomy distribution ({taxonomy_total}) exceeds pattern menu questions ({generated_questions_count}). Reduce it before generating.")
+            st.stop()
+
+        # Instruction blocks are built once and shared by both prompts and the question paper header
+        mark_distribution = question_instruction(active_custom_questions)
+        taxonomy_dist = taxonomy_instruction()
+        custom_dist = custom_questions_instruction(active_custom_questions)
+
         # Generate prompt
         prompt = master_prompt(
             topic_text=topic,
@@ -620,18 +802,53 @@ if input_ready:
             gen_q_count=generated_questions_count,
             custom_q_count=custom_questions_count,
             total_q=total_questions,
-            custom_qs=active_custom_questions
+            mark_distribution=mark_distribution,
+            taxonomy_dist=taxonomy_dist,
+            custom_dist=custom_dist
         )
 
-        with st.spinner("🔄 Generating content... (this may take 30-60 seconds)"):
+        # Everything that changes what gets generated must match exactly: the question
+        # structure and the instructions. Only the topic wording is compared by
+        # embedding, so "DBMS" can reuse a "Database Management Systems" pack. An
+        # uploaded syllabus is matched exactly by the prompt cache inside gemini.stream()
+        semantic_scope = master_prompt(
+            topic_text="",
+            syllabus="",
+            instructions=extra_prompt,
+            gen_q_count=generated_questions_count,
+            custom_q_count=custom_questions_count,
+            total_q=total_questions,
+            mark_distribution=mark_distribution,
+            taxonomy_dist=taxonomy_dist,
+            custom_dist=custom_dist
+        )
+        cached_content, query_vector = None, None
+
+        with st.status("🔄 Generating content... (this may take 30-60 seconds)", expanded=False) as status:
             try:
-                content = gemini.run(prompt)
-                st.success("✅ Content generated successfully!")
+                if regenerate:
+                    # Drop the packs this request could be matched to, so later runs
+                    # reuse the fresh one instead
+                    semantic_cache.discard(semantic_scope)
+                elif topic:
+                    # The embedding call is a network round trip; it runs inside the status box
+                    cached_content, query_vector = semantic_cache.lookup(semantic_scope, topic)
+
+                if cached_content is not None:
+                    content = cached_content
+                    st.markdown(content)
+                    status.update(label="✅ Reused content from a near-identical request", state="complete")
+                else:
+                    # Stream into the collapsed status box so progress is visible while Gemini writes
+                    content = st.write_stream(gemini.stream(prompt, use_cache=not regenerate))
+                    status.update(label="✅ Content generated successfully!", state="complete")
             except RuntimeError as e:
+                status.update(label="❌ Generation failed", state="error", expanded=True)
                 st.error(f"❌ Gemini API Error: {str(e)}")
                 st.info("💡 **Possible solutions:**\n- Check your API key is valid\n- Verify you have quota remaining\n- Try reducing the complexity of your request\n- Wait a few moments and try again")
                 st.stop()
             except Exception as e:
+                status.update(label="❌ Generation failed", state="error", expanded=True)
                 st.error(f"❌ Unexpected error: {str(e)}")
                 st.info(f"Error type: {type(e).__name__}")
                 import traceback
@@ -650,6 +867,9 @@ if input_ready:
                 st.text(content)
             st.stop()
         
+        if cached_content is None:
+            semantic_cache.store(semantic_scope, query_vector, content)
+
         st.info(f"📊 Processing content... ({len(content)} characters received)")
 
         # ================== SPLIT SECTIONS ==================
@@ -662,22 +882,18 @@ if input_ready:
             "qbank": ""
         }
 
-        normalized_content = content.replace("\r", "")
-        section_patterns = {
-            "notes": r"(?:^|\n)\s*(?:SECTION\s*1\s*:\s*STRUCTURED\s*NOTES|1\.\s*STRUCTURED\s*NOTES)",
-            "roadmap": r"(?:^|\n)\s*(?:SECTION\s*2\s*:\s*LEARNING\s*ROADMAP|2\.\s*LEARNING\s*ROADMAP)",
-            "resources": r"(?:^|\n)\s*(?:SECTION\s*3\s*:\s*IMPORTANT\s*RESOURCES|3\.\s*IMPORTANT\s*RESOURCES)",
-            "qbank": r"(?:^|\n)\s*(?:SECTION\s*4\s*:\s*QUESTION\s*BANK\s*WITH\s*ANSWERS|4\.\s*QUESTION\s*BANK\s*WITH\s*ANSWERS|4\.\s*QUESTION\s*BANK|SECTION\s*4\s*:\s*QUESTION\s*BANK|SECTION\s*1\s*:\s*QUESTIONS\s*ONLY\s*\(FOR\s*STUDENTS\)|SECTION\s*1\s*:\s*QUESTION\s*PAPER)",
-        }
+        # GeminiLLM already strips carriage returns
+        normalized_content = content
 
+        # Matches arrive in document order; keep the first marker of each section
         section_positions = {}
-        for key, pattern in section_patterns.items():
-            match = re.search(pattern, normalized_content, flags=re.IGNORECASE)
-            if match:
-                section_positions[key] = match.start()
+        for match in SECTIONS_PATTERN.finditer(normalized_content):
+            section_positions.setdefault(match.lastgroup, match.start())
+            if len(section_positions) == len(sections):
+                break
 
         if section_positions:
-            ordered_sections = sorted(section_positions.items(), key=lambda item: item[1])
+            ordered_sections = list(section_positions.items())
             for idx, (name, start_idx) in enumerate(ordered_sections):
                 end_idx = ordered_sections[idx + 1][1] if idx + 1 < len(ordered_sections) else len(normalized_content)
                 sections[name] = normalized_content[start_idx:end_idx].strip()
@@ -687,24 +903,11 @@ if input_ready:
         else:
             sections["notes"] = normalized_content
 
-        if not sections["qbank"]:
-            qbank_fallback = re.search(
-                r"(?:^|\n)\s*(?:SECTION\s*1\s*:\s*QUESTIONS\s*ONLY\s*\(FOR\s*STUDENTS\)|SECTION\s*1\s*:\s*QUESTION\s*PAPER)",
-                normalized_content,
-                flags=re.IGNORECASE,
-            )
-            if qbank_fallback:
-                sections["qbank"] = normalized_content[qbank_fallback.start():].strip()
-
         # Extract questions and answers separately
         qbank = sections["qbank"] or normalized_content
-        qbank_text = qbank.replace("\r", "")
+        qbank_text = qbank
 
-        qpaper_start = re.search(
-            r"(?:SECTION\s*1\s*:\s*QUESTIONS\s*ONLY|SECTION\s*1\s*:\s*QUESTION\s*PAPER|QUESTIONS\s*ONLY\s*\(FOR\s*STUDENTS\))",
-            qbank_text,
-            flags=re.IGNORECASE,
-        )
+        qpaper_start = QPAPER_START_PATTERN.search(qbank_text)
         if qpaper_start:
             qbank_text = qbank_text[qpaper_start.start():]
 
@@ -712,17 +915,17 @@ if input_ready:
         answers_only = ""
         
         # Split by SECTION 2 marker (more robust)
-        if "SECTION 2" in qbank_text:
-            idx = qbank_text.find("SECTION 2")
+        idx = qbank_text.find("SECTION 2")
+        if idx != -1:
             questions_only = qbank_text[:idx].strip()
             answers_only = qbank_text[idx:].strip()
             
             # Clean up section headers
-            questions_only = re.sub(r"SECTION\s*1.*?(?:QUESTIONS?:|$)", "", questions_only, flags=re.IGNORECASE | re.DOTALL).strip()
-            answers_only = re.sub(r"SECTION\s*2.*?(?:ANSWER\s*KEY:?|$)", "", answers_only, flags=re.IGNORECASE | re.DOTALL).strip()
+            questions_only = QUESTIONS_HEADER_PATTERN.sub("", questions_only).strip()
+            answers_only = ANSWERS_HEADER_PATTERN.sub("", answers_only).strip()
         else:
             # Fallback: split by ANSWER KEY marker
-            answer_key_match = re.search(r"ANSWER\s*KEY\s*:?", qbank_text, flags=re.IGNORECASE)
+            answer_key_match = ANSWER_KEY_PATTERN.search(qbank_text)
             if answer_key_match:
                 idx = answer_key_match.start()
                 questions_only = qbank_text[:idx].strip()
@@ -730,20 +933,12 @@ if input_ready:
 
             # Regex fallback: extract Question/Answer blocks if markers missing
             if not answers_only:
-                answer_blocks = re.findall(
-                    r"Answer\s*\d+\s*[:.)-]\s*(.*?)(?=\n\s*Answer\s*\d+\s*[:.)-]|\Z)",
-                    qbank_text,
-                    flags=re.IGNORECASE | re.DOTALL,
-                )
+                answer_blocks = ANSWER_BLOCK_PATTERN.findall(qbank_text)
                 if answer_blocks:
                     answers_only = "\n\n".join(a.strip() for a in answer_blocks).strip()
 
             if not questions_only:
-                question_blocks = re.findall(
-                    r"Question\s*\d+\s*\([^\n]*\)\s*[:.)-]\s*(.*?)(?=\n\s*Question\s*\d+\s*\(|\Z)",
-                    qbank_text,
-                    flags=re.IGNORECASE | re.DOTALL,
-                )
+                question_blocks = QUESTION_BLOCK_PATTERN.findall(qbank_text)
                 if question_blocks:
                     questions_only = "\n\n".join(q.strip() for q in question_blocks).strip()
 
@@ -754,6 +949,13 @@ if input_ready:
 
         # ================== CREATE PDFs ==================
 
+        pdf_jobs = {
+            "01_Notes": ("Structured Notes", sections["notes"]),
+            "02_Roadmap": ("Learning Roadmap", sections["roadmap"]),
+            "03_Resources": ("Important Resources", sections["resources"]),
+        }
+
+        # Skip question bank when no questions
         if total_questions > 0:
             # Add instructions to question paper (include mark distribution)
             question_instructions = """═══════════════════════════════════════
@@ -767,11 +969,9 @@ INSTRUCTIONS:
 - Follow the given mark distribution
 """
 
-            mark_distribution = question_instruction(active_custom_questions)
             if mark_distribution:
                 question_instructions = f"{question_instructions}\nMARK DISTRIBUTION:\n{mark_distribution}\n"
             
-            taxonomy_dist = taxonomy_instruction()
             if taxonomy_dist and st.session_state["bloom_taxonomy"]:
                 question_instructions = f"{question_instructions}\nBLOOM'S TAXONOMY DISTRIBUTION:\n{taxonomy_dist}\n"
 
@@ -779,48 +979,43 @@ INSTRUCTIONS:
 
             qa_combined = f"{questions_only}\n\n{'═'*40}\nANSWER KEY\n{'═'*40}\n\n{answers_only}".strip()
 
-            pdfs = {
-                "01_Notes": create_pdf("Structured Notes", sections["notes"]),
-                "02_Roadmap": create_pdf("Learning Roadmap", sections["roadmap"]),
-                "03_Resources": create_pdf("Important Resources", sections["resources"]),
-                "04_QA": create_pdf("Question Bank", qa_combined),
-            }
-            
-            display_content = {
-                "01_Notes": sections["notes"],
-                "02_Roadmap": sections["roadmap"],
-                "03_Resources": sections["resources"],
-                "04_QA": qa_combined,
-            }
-        else:
-            # Skip question bank when no questions
-            pdfs = {
-                "01_Notes": create_pdf("Structured Notes", sections["notes"]),
-                "02_Roadmap": create_pdf("Learning Roadmap", sections["roadmap"]),
-                "03_Resources": create_pdf("Important Resources", sections["resources"]),
-            }
-            
-            display_content = {
-                "01_Notes": sections["notes"],
-                "02_Roadmap": sections["roadmap"],
-                "03_Resources": sections["resources"],
+            pdf_jobs["04_QA"] = ("Question Bank", qa_combined)
+
+        # The PDFs are independent; render them concurrently (fpdf compresses each page with zlib,
+        # which releases the GIL)
+        with ThreadPoolExecutor(max_workers=len(pdf_jobs)) as executor:
+            futures = {
+                name: executor.submit(render_pdf, title, body)
+                for name, (title, body) in pdf_jobs.items()
             }
+            # Kept as bytes so reruns hand them to the download buttons without seek/read
+            pdf_bytes = {name: future.result() for name, future in futures.items()}
+
+        display_content = {name: body for name, (_, body) in pdf_jobs.items()}
         
-        st.session_state["pdfs"] = pdfs
+        # Build the ZIP once per generation; reruns serve the stored bytes
+        zip_buffer = BytesIO()
+        # Level 1 keeps nearly all of the size win (fpdf's text streams compress well) at a fraction of the CPU
+        with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+            for name, data in pdf_bytes.items():
+                zipf.writestr(f"{name}.pdf", data)
+
+        st.session_state["pdf_bytes"] = pdf_bytes
+        st.session_state["zip_bytes"] = zip_buffer.getvalue()
         st.session_state["sections"] = display_content
-        st.session_state["generation_id"] = hashlib.md5(str(time.time()).encode()).hexdigest()[:8]
+        st.session_state["generation_id"] = secrets.token_hex(4)
 
         st.success("✅ Learning pack generated successfully!")
 
 # ================== DISPLAY DOWNLOADS (outside button block - persists) ==================
 
-if st.session_state["pdfs"]:
+if st.session_state["pdf_bytes"]:
     st.markdown("## 📥 Downloads & Preview")
     st.markdown("---")
     
     gen_id = st.session_state.get("generation_id", "default")
 
-    for idx, (name, pdf) in enumerate(st.session_state["pdfs"].items()):
+    for idx, (name, data) in enumerate(st.session_state["pdf_bytes"].items()):
         with st.expander(f"📄 {name}", expanded=(idx == 0)):
             tab1, tab2 = st.tabs(["👁️ Preview Content", "📥 Download PDF"])
             
@@ -839,10 +1034,9 @@ if st.session_state["pdfs"]:
                     st.warning(f"Preview not available for {name}")
             
             with tab2:
-                pdf.seek(0)
                 st.download_button(
                     f"⬇️ Download {name}",
-                    pdf,
+                    data,
                     file_name=f"{name}.pdf",
                     mime="application/pdf",
                     use_container_width=True,
@@ -854,17 +1048,9 @@ if st.session_state["pdfs"]:
     
     # ================== ZIP DOWNLOAD ==================
 
-    zip_buffer = BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for name, pdf in st.session_state["pdfs"].items():
-            pdf.seek(0)
-            zipf.writestr(f"{name}.pdf", pdf.read())
-
-    zip_buffer.seek(0)
-
     st.download_button(
         "📦 Download Complete Learning Pack",
-        zip_buffer,
+        st.session_state["zip_bytes"],
         file_name="Mentorix_Complete_Pack.zip",
         mime="application/zip",
         use_container_width=True,
@@ -0,0 +1,46 @@
+import math
+import unittest
+
+from gemini_llm import SemanticCache
+
+def _unit(angle_cos):
+    # 2-d unit vector whose cosine with (1, 0) is angle_cos
+    return [angle_cos, math.sqrt(1 - angle_cos ** 2)]
+
+class FakeLLM:
+    # Vectors chosen by their cosine with "Operating Systems"
+    VECTORS = {
+        "Operating Systems": _unit(1.0),
+        "operating systems ": _unit(0.995),
+        "Distributed Systems": _unit(0.96),
+    }
+
+    def embed(self, text):
+        return self.VECTORS[text]
+
+class SemanticCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cache = SemanticCache(FakeLLM())
+        _, vector = self.cache.lookup("scope", "Operating Systems")
+        self.cache.store("scope", vector, "OS pack")
+
+    def test_rewording_of_same_topic_hits(self):
+        response, _ = self.cache.lookup("scope", "operating systems ")
+        self.assertEqual(response, "OS pack")
+
+    def test_related_but_distinct_topic_misses(self):
+        response, vector = self.cache.lookup("scope", "Distributed Systems")
+        self.assertIsNone(response)
+        self.assertIsNotNone(vector)
+
+    def test_other_scope_misses(self):
+        response, _ = self.cache.lookup("other scope", "Operating Systems")
+        self.assertIsNone(response)
+
+    def test_discard_forgets_scope(self):
+        self.cache.discard("scope")
+        response, _ = self.cache.lookup("scope", "Operating Systems")
+        self.assertIsNone(response)
+
+if __name__ == "__main__":
+    unittest.main()